@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Brain Scan Image Features
+Shared by simplified-medical-trainer.py and inference-brain-mri.py so that
+training and serving decode and resize images the same way
+"""
+
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+# Images are reduced to this many grayscale pixels (64 * 64 features)
+BRAIN_IMAGE_SIZE = (64, 64)
+
+# Pixels are scaled to [0, 1] in float32
+BRAIN_PIXEL_SCALE = np.float32(1.0 / 255.0)
+
+def load_brain_image(source) -> np.ndarray:
+    """Grayscale BRAIN_IMAGE_SIZE pixels of one image (path or bytes) as a flat uint8 row"""
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    
+    with Image.open(source) as img:
+        # JPEGs decode straight to grayscale at a reduced scale (no-op for other formats)
+        img.draft('L', BRAIN_IMAGE_SIZE)
+        
+        # Convert to grayscale and resize
+        img = img.convert('L').resize(BRAIN_IMAGE_SIZE, Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8).ravel()
+
+def brain_features(source) -> np.ndarray:
+    """Model input for one image: a (1, 64 * 64) float32 row of [0, 1]-scaled pixels"""
+    return np.multiply(load_brain_image(source), BRAIN_PIXEL_SCALE, dtype=np.float32).reshape(1, -1)
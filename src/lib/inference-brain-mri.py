@@ -11,10 +11,9 @@ import os
 import warnings
 warnings.filterwarnings('ignore')
 
-# Image processing
+# Image processing (the same loader the trainer uses)
 try:
-    from PIL import Image
-    import cv2
+    from brain_image_features import brain_features
     IMAGE_AVAILABLE = True
 except ImportError:
     IMAGE_AVAILABLE = False
@@ -30,57 +29,20 @@ def load_brain_mri_model():
             raise FileNotFoundError(f"Brain classification model not found at {model_path}")
         
         model = joblib.load(model_path)
-        scaler = joblib.load(scaler_path)
+        # Tree models are trained on raw pixels and ship without a scaler
+        scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
         
         return model, scaler
     except Exception as e:
         raise Exception(f"Failed to load brain classification model: {str(e)}")
 
-def preprocess_brain_image(image_data, target_size=(128, 128)):
-    """Preprocess brain MRI image for prediction"""
+def extract_brain_features(image_data):
+    """Extract model features from a brain MRI image (file path or bytes)"""
     if not IMAGE_AVAILABLE:
         raise ImportError("Image processing libraries not available")
     
     try:
-        # Convert image data to PIL Image
-        if isinstance(image_data, str):
-            # Assume it's a file path
-            img = Image.open(image_data)
-        elif isinstance(image_data, bytes):
-            # Assume it's image bytes
-            from io import BytesIO
-            img = Image.open(BytesIO(image_data))
-        else:
-            raise ValueError("Invalid image data format")
-        
-        # Convert to RGB if necessary
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Resize image
-        img = img.resize(target_size)
-        img_array = np.array(img) / 255.0  # Normalize
-        
-        return img_array
-        
-    except Exception as e:
-        raise Exception(f"Failed to preprocess image: {str(e)}")
-
-def extract_brain_features(img_array):
-    """Extract features from brain MRI image"""
-    try:
-        # Convert to grayscale and flatten (simple approach)
-        if len(img_array.shape) == 3:
-            # Convert RGB to grayscale
-            gray = np.dot(img_array[...,:3], [0.2989, 0.5870, 0.1140])
-        else:
-            gray = img_array
-        
-        # Flatten the image as features
-        feature_vector = gray.flatten()
-        
-        return feature_vector.reshape(1, -1)
-        
+        return brain_features(image_data)
     except Exception as e:
         raise Exception(f"Failed to extract features: {str(e)}")
 
@@ -90,14 +52,11 @@ def predict_brain_tumor(image_data):
         # Load model
         model, scaler = load_brain_mri_model()
         
-        # Preprocess image
-        img_array = preprocess_brain_image(image_data, target_size=(64, 64))
-        
-        # Extract features
-        features = extract_brain_features(img_array)
+        # Extract features (grayscale 64x64 pixels, decoded exactly as in training)
+        features = extract_brain_features(image_data)
         
         # Scale features
-        features_scaled = scaler.transform(features)
+        features_scaled = scaler.transform(features) if scaler is not None else features
         
         # Predict
         prediction = model.predict(features_scaled)[0]
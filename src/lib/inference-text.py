@@ -24,6 +24,24 @@ try:
 except ImportError:
     NLP_AVAILABLE = False
 
+try:
+    import spacy
+    SPACY_AVAILABLE = True
+except ImportError:
+    SPACY_AVAILABLE = False
+
+# Must match SPACY_MODEL in model-trainer.py
+SPACY_MODEL = "en_core_web_sm"
+
+def load_text_preprocessor():
+    """Preprocessor recorded in the model metadata ('nltk' for models trained before it was recorded)"""
+    metadata_path = os.path.join(os.getcwd(), 'trained_models', 'medical_text_metadata.json')
+    try:
+        with open(metadata_path) as f:
+            return json.load(f).get('text_preprocessor', 'nltk')
+    except (OSError, ValueError):
+        return 'nltk'
+
 def load_medical_text_model():
     """Load trained medical text classification model"""
     try:
@@ -67,6 +85,15 @@ def preprocess_medical_text(text):
     except:
         return text.lower()
 
+def preprocess_medical_text_spacy(text):
+    """Preprocess medical text the way the trainer's spaCy batch path does"""
+    if not SPACY_AVAILABLE:
+        raise ImportError("Model was trained with spaCy preprocessing but spaCy is not installed")
+    
+    nlp = spacy.load(SPACY_MODEL, disable=["parser", "ner"])
+    doc = nlp(text.lower() if isinstance(text, str) else "")
+    return ' '.join(tok.lemma_.lower() for tok in doc if tok.is_alpha and not tok.is_stop)
+
 def predict_medical_specialty(text):
     """Predict medical specialty from text"""
     try:
@@ -76,8 +103,11 @@ def predict_medical_specialty(text):
         if not text or len(text.strip()) == 0:
             raise ValueError("Empty text provided")
         
-        # Preprocess text
-        processed_text = preprocess_medical_text(text)
+        # Preprocess text with the same pipeline the model was trained on
+        if load_text_preprocessor() == 'spacy':
+            processed_text = preprocess_medical_text_spacy(text)
+        else:
+            processed_text = preprocess_medical_text(text)
         
         # Vectorize text
         text_vector = vectorizer.transform([processed_text])
@@ -6,6 +6,7 @@ Handles CSV, text, and image datasets with embeddings generation
 
 import os
 import json
+import hashlib
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -26,6 +27,14 @@ except ImportError as e:
     print(f"Missing dependencies: {e}")
     print("Install with: pip install sentence-transformers torch torchvision pillow transformers faiss-cpu")
 
+# ONNX Runtime (int8 CPU text encoder)
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
 # MongoDB
 try:
     from pymongo import MongoClient
@@ -34,6 +43,45 @@ try:
 except ImportError:
     print("MongoDB dependencies missing. Install with: pip install pymongo motor")
 
+TEXT_MODEL_NAME = 'emilyalsentzer/Bio_ClinicalBERT'
+IMAGE_MODEL_NAME = 'ViT-B/32'
+
+class OnnxSentenceEncoder:
+    """
+    Mean-pooled sentence encoder on a dynamically quantized (int8) ONNX model,
+    exposing the subset of SentenceTransformer.encode() used by the search engine
+    """
+    
+    def __init__(self, model_dir: Path, max_seq_length: int = 512):
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.model = ORTModelForFeatureExtraction.from_pretrained(str(model_dir), file_name="model_quantized.onnx")
+        self.max_seq_length = min(max_seq_length, self.tokenizer.model_max_length)
+    
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        
+        embeddings = np.vstack(batches).astype(np.float32)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        
+        return embeddings[0] if single else embeddings
+
 class MedicalDatasetLoader:
     """
     Handles loading and processing of medical datasets for search indexing
@@ -111,13 +159,16 @@ class MedicalDatasetLoader:
     def initialize_models(self):
         """Initialize text and image embedding models"""
         try:
-            # Initialize BioBERT for medical text
+            # Initialize BioBERT for medical text (int8 ONNX on CPU-only hosts)
             self.logger.info("Loading BioBERT model for medical text embeddings...")
-            self.text_model = SentenceTransformer('emilyalsentzer/Bio_ClinicalBERT')
+            if self.device == "cpu" and ONNX_AVAILABLE:
+                self.text_model = self._load_onnx_text_model(TEXT_MODEL_NAME)
+            if self.text_model is None:
+                self.text_model = SentenceTransformer(TEXT_MODEL_NAME)
             
             # Initialize CLIP for image embeddings
             self.logger.info("Loading CLIP model for image embeddings...")
-            self.image_model, self.image_preprocess = clip.load("ViT-B/32", device=self.device)
+            self.image_model, self.image_preprocess = clip.load(IMAGE_MODEL_NAME, device=self.device)
             
             self.logger.info("Models initialized successfully")
             return True
@@ -125,6 +176,24 @@ class MedicalDatasetLoader:
             self.logger.error(f"Failed to initialize models: {e}")
             return False
     
+    def _load_onnx_text_model(self, model_name: str) -> Optional[OnnxSentenceEncoder]:
+        """Export and int8-quantize the text model once, then load it with ONNX Runtime"""
+        onnx_dir = self.cache_dir / "onnx" / model_name.replace('/', '__')
+        
+        try:
+            if not (onnx_dir / "model_quantized.onnx").exists():
+                self.logger.info("Exporting text model to ONNX with dynamic int8 quantization...")
+                ort_model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+                quantizer = ORTQuantizer.from_pretrained(ort_model)
+                quantization_config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+                quantizer.quantize(save_dir=str(onnx_dir), quantization_config=quantization_config)
+                AutoTokenizer.from_pretrained(model_name).save_pretrained(str(onnx_dir))
+            
+            return OnnxSentenceEncoder(onnx_dir)
+        except Exception as e:
+            self.logger.warning(f"ONNX text model unavailable, falling back to PyTorch: {e}")
+            return None
+    
     def load_csv_datasets(self) -> List[Dict[str, Any]]:
         """Load and process CSV medical datasets"""
         self.logger.info("Loading CSV datasets...")
@@ -346,10 +415,18 @@ class MedicalDatasetLoader:
         
         self.logger.info(f"Generating embeddings for {len(data_items)} text items...")
         
+        # Encode in length order so each batch pads to similar lengths, then restore order
         texts = [item['content'] for item in data_items]
-        embeddings = self.text_model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        embeddings = self.text_model.encode(
+            [texts[i] for i in order],
+            batch_size=64,
+            show_progress_bar=True,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
         
-        return embeddings
+        return embeddings[np.argsort(order)]
     
     def generate_image_embeddings(self, data_items: List[Dict[str, Any]]) -> List[np.ndarray]:
         """Generate embeddings for image data"""
@@ -383,12 +460,24 @@ class MedicalDatasetLoader:
         
         return np.array(embeddings)
     
+    def _source_signature(self) -> str:
+        """Hash of the path, size and mtime of every file under datasets_dir"""
+        h = hashlib.blake2b(digest_size=16)
+        for root, dirs, files in os.walk(self.datasets_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                h.update(f"{os.path.relpath(path, self.datasets_dir)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+        return h.hexdigest()
+    
     def save_data_cache(self, filename: str = "medical_data_cache.pkl"):
         """Save loaded data to cache file"""
         cache_file = self.cache_dir / filename
         
         cache_data = {
             'loaded_data': self.loaded_data,
+            'source_signature': self._source_signature(),
             'timestamp': datetime.now().isoformat(),
             'total_items': sum(len(data) for data in self.loaded_data.values())
         }
@@ -409,6 +498,11 @@ class MedicalDatasetLoader:
             with open(cache_file, 'rb') as f:
                 cache_data = pickle.load(f)
             
+            # Reload when any dataset file was added, removed or modified since the cache was written
+            if cache_data.get('source_signature') != self._source_signature():
+                self.logger.info("Dataset files changed since the data cache was written, reloading")
+                return False
+            
             self.loaded_data = cache_data['loaded_data']
             self.logger.info(f"Loaded {cache_data['total_items']} items from cache")
             return True
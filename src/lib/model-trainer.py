@@ -6,37 +6,70 @@ Trains custom models on healthcare datasets for improved symptom checking
 
 import os
 import sys
+import multiprocessing
+
+# Physical core count (SMT siblings oversubscribe RF/BLAS threads)
+try:
+    import psutil
+    PHYS = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+except ImportError:
+    PHYS = os.cpu_count() or 1
+
+# Must be set before numpy/sklearn load their BLAS/OpenMP runtimes
+os.environ.setdefault("OMP_NUM_THREADS", str(PHYS))
+os.environ.setdefault("OPENBLAS_NUM_THREADS", str(PHYS))
+
 import pandas as pd
 import numpy as np
 import json
+import hashlib
 from datetime import datetime
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
+from dataclasses import dataclass
+from operator import attrgetter
 import warnings
 warnings.filterwarnings('ignore')
 
 # Machine Learning Libraries
 import sklearn
-from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
+from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold, StratifiedShuffleSplit
 from sklearn.preprocessing import StandardScaler, LabelEncoder, MinMaxScaler
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.svm import SVC
+from sklearn.feature_selection import VarianceThreshold
+from sklearn.pipeline import make_pipeline
+from sklearn.utils import gen_batches
 import joblib
 
-# Deep Learning Libraries
+# lz4 keeps saves fast while shrinking forest pickles; fall back to zlib without it
 try:
-    import tensorflow as tf
-    from tensorflow.keras.models import Sequential, Model
-    from tensorflow.keras.layers import Dense, Dropout, Conv1D, LSTM, Embedding, GlobalMaxPooling1D
-    from tensorflow.keras.optimizers import Adam
-    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
-    TF_AVAILABLE = True
+    import lz4
+    MODEL_COMPRESS = ('lz4', 3)
 except ImportError:
-    TF_AVAILABLE = False
+    MODEL_COMPRESS = ('zlib', 3)
+
+# Deep Learning Libraries (detected without importing; TF startup costs seconds and hundreds of MB)
+import importlib.util
+TF_AVAILABLE = importlib.util.find_spec("tensorflow") is not None
+if not TF_AVAILABLE:
     print("TensorFlow not available. Using scikit-learn models only.")
 
+# JIT for the quantized forest predictor
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+    
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 # NLP Libraries
 try:
     import nltk
@@ -51,14 +84,178 @@ except ImportError:
     NLP_AVAILABLE = False
     print("NLTK not available. Basic text processing only.")
 
+try:
+    import spacy
+    SPACY_AVAILABLE = True
+except ImportError:
+    SPACY_AVAILABLE = False
+
+# spaCy pipeline for batched preprocessing (inference-text.py must use the same one)
+SPACY_MODEL = "en_core_web_sm"
+_spacy_nlp = None
+
+def _fit_rf_shard(args):
+    """Fit one RandomForest shard (module-level so it pickles into Pool workers)"""
+    X, y, n_estimators, seed, class_weight = args
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=seed, n_jobs=1, class_weight=class_weight)
+    model.fit(X, y)
+    return model
+
+def fit_rf_sharded(X, y, total: int = 100, n_procs: int = PHYS, class_weight=None) -> RandomForestClassifier:
+    """Fit a RandomForest by splitting its trees across processes and merging the estimators"""
+    n_procs = max(1, min(n_procs, total))
+    sizes = [total // n_procs + (1 if i < total % n_procs else 0) for i in range(n_procs)]
+    
+    with multiprocessing.Pool(processes=n_procs) as pool:
+        workers = pool.map(_fit_rf_shard, [(X, y, size, 42 + i, class_weight) for i, size in enumerate(sizes)])
+    
+    final = workers[0]
+    final.estimators_ = sum((w.estimators_ for w in workers), [])
+    final.n_estimators = total
+    final.n_jobs = PHYS
+    return final
+
+def bin_features(X, bin_edges: np.ndarray) -> np.ndarray:
+    """Map each feature column to its uint8 bin index using the training bin edges"""
+    X = np.asarray(X, dtype=np.float32)
+    X_binned = np.empty(X.shape, dtype=np.uint8)
+    for j in range(X.shape[1]):
+        X_binned[:, j] = np.searchsorted(bin_edges[j], X[:, j], side='left')
+    return X_binned
+
+def quantize_forest(model: RandomForestClassifier, X_train, n_bins: int = 256) -> Dict:
+    """
+    Flatten a fitted forest into lean arrays with thresholds expressed as bin indices
+    (int16), children as int32 and leaf class probabilities as float32
+    """
+    X_train = np.asarray(X_train, dtype=np.float32)
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    bin_edges = np.quantile(X_train, quantiles, axis=0).T.astype(np.float32)
+    
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for est in model.estimators_:
+        tree = est.tree_
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        is_leaf = left == -1
+        
+        feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+        threshold = np.zeros(tree.node_count, dtype=np.int16)
+        for node in np.flatnonzero(~is_leaf):
+            threshold[node] = np.searchsorted(bin_edges[feature[node]], tree.threshold[node], side='left')
+        
+        value = tree.value[:, 0, :].astype(np.float32)
+        value /= np.maximum(value.sum(axis=1, keepdims=True), 1e-12)
+        
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(np.where(is_leaf, -1, left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, right + offset).astype(np.int32))
+        values.append(value)
+        roots.append(offset)
+        offset += tree.node_count
+    
+    return {
+        'bin_edges': bin_edges,
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'children_left': np.concatenate(lefts),
+        'children_right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'classes': np.asarray(model.classes_)
+    }
+
+@njit(parallel=True, cache=True)
+def _predict_quantized_proba(X_binned, feature, threshold, left, right, value, roots):
+    n_samples = X_binned.shape[0]
+    n_trees = roots.shape[0]
+    n_classes = value.shape[1]
+    out = np.zeros((n_samples, n_classes), dtype=np.float32)
+    for i in prange(n_samples):
+        for t in range(n_trees):
+            node = roots[t]
+            while left[node] != -1:
+                if X_binned[i, feature[node]] <= threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            for c in range(n_classes):
+                out[i, c] += value[node, c]
+    return out / n_trees
+
+def predict_quantized(X_binned: np.ndarray, trees: Dict) -> np.ndarray:
+    """Predict class labels from binned features (see bin_features) with a quantized forest"""
+    proba = _predict_quantized_proba(
+        np.ascontiguousarray(X_binned, dtype=np.uint8),
+        trees['feature'], trees['threshold'],
+        trees['children_left'], trees['children_right'],
+        trees['value'], trees['roots']
+    )
+    return trees['classes'][proba.argmax(axis=1)]
+
+def _preprocess_medical_text(text: str, lemmatizer, stop_words) -> str:
+    """Tokenize, drop stopwords and lemmatize a single transcription"""
+    if not NLP_AVAILABLE or not text:
+        return text.lower() if text else ""
+    
+    try:
+        # Tokenize
+        tokens = word_tokenize(text.lower())
+        
+        # Remove stopwords and lemmatize
+        processed_tokens = [
+            lemmatizer.lemmatize(token) 
+            for token in tokens 
+            if token.isalpha() and token not in stop_words
+        ]
+        
+        return ' '.join(processed_tokens)
+    except:
+        return text.lower()
+
+def _preprocess_medical_text_batch(texts: List[str]) -> List[str]:
+    """Preprocess a batch of texts (module-level so joblib.Memory can hash and cache it)"""
+    lemmatizer = WordNetLemmatizer() if NLP_AVAILABLE else None
+    stop_words = set(stopwords.words('english')) if NLP_AVAILABLE else set()
+    return [_preprocess_medical_text(text, lemmatizer, stop_words) for text in texts]
+
+def _load_spacy_nlp():
+    """Load the spaCy pipeline once per process (tagger and lemmatizer only)"""
+    global _spacy_nlp
+    if _spacy_nlp is None:
+        _spacy_nlp = spacy.load(SPACY_MODEL, disable=["parser", "ner"])
+    return _spacy_nlp
+
+def _preprocess_medical_text_batch_spacy(texts: List[str]) -> List[str]:
+    """Lemmas of alphabetic non-stopword tokens via one spaCy nlp.pipe pass (cached like the NLTK batch)"""
+    texts = [text.lower() if isinstance(text, str) else "" for text in texts]
+    return [
+        ' '.join(tok.lemma_.lower() for tok in doc if tok.is_alpha and not tok.is_stop)
+        for doc in _load_spacy_nlp().pipe(texts, batch_size=512, n_process=PHYS)
+    ]
+
+@dataclass
+class ModelResult:
+    """Evaluation of one candidate model during best-model selection"""
+    name: str
+    model: Any
+    test_acc: float
+    train_acc: Optional[float] = None
+    scaler: Any = None
+    cv_mean: Optional[float] = None
+    cv_std: Optional[float] = None
+
 class MedicalDatasetTrainer:
     """
     Comprehensive training system for medical datasets
     """
     
-    def __init__(self, datasets_dir: str = "datasets", models_dir: str = "trained_models"):
+    def __init__(self, datasets_dir: str = "datasets", models_dir: str = "trained_models", force_retrain: bool = False):
         self.datasets_dir = datasets_dir
         self.models_dir = models_dir
+        self.force_retrain = force_retrain
         self.trained_models = {}
         self.training_history = {}
         
@@ -76,13 +273,68 @@ class MedicalDatasetTrainer:
         )
         self.logger = logging.getLogger(__name__)
         
+        # Disk cache for preprocessed text, so re-training skips the NLTK/spaCy pass
+        self.memory = joblib.Memory(os.path.join(self.models_dir, ".cache"), verbose=0)
+        self._preprocess_batch_cached = self.memory.cache(_preprocess_medical_text_batch)
+        self._preprocess_spacy_cached = self.memory.cache(_preprocess_medical_text_batch_spacy)
+        
         # Initialize text preprocessor
         if NLP_AVAILABLE:
             self.lemmatizer = WordNetLemmatizer()
             self.stop_words = set(stopwords.words('english'))
         
+        # spaCy batch pipeline (Cython tokenizer + lemma lookup) when the model is installed;
+        # recorded in the text model metadata so inference preprocesses the same way
+        self.text_preprocessor = 'nltk'
+        if SPACY_AVAILABLE:
+            try:
+                _load_spacy_nlp()
+                self.text_preprocessor = 'spacy'
+            except OSError:
+                self.logger.warning(f"spaCy model {SPACY_MODEL} not installed, using NLTK preprocessing")
+        
         self.logger.info("Medical Dataset Trainer initialized")
     
+    def _dataset_hash(self, *paths: str) -> str:
+        """Cheap fingerprint of dataset files: size plus the first 1MB of each"""
+        h = hashlib.blake2b(digest_size=8)
+        for path in paths:
+            h.update(str(os.path.getsize(path)).encode())
+            with open(path, 'rb') as f:
+                h.update(f.read(1 << 20))
+        return h.hexdigest()
+    
+    def _load_cached_metadata(self, key: str, metadata_file: str, dataset_hash: str) -> Optional[Dict]:
+        """Return saved metadata if it was trained on the same dataset and its artifacts still exist"""
+        metadata_path = os.path.join(self.models_dir, metadata_file)
+        if self.force_retrain or not os.path.exists(metadata_path):
+            return None
+        
+        try:
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if metadata.get('dataset_hash') != dataset_hash:
+            return None
+        if not all(os.path.exists(v) for k, v in metadata.items() if k.endswith('_path')):
+            return None
+        
+        self.trained_models[key] = metadata
+        self.logger.info(f"{key} dataset unchanged ({dataset_hash}), reusing saved model")
+        return metadata
+    
+    def _load_or_cache_csv(self, path: str) -> np.ndarray:
+        """Load a headerless numeric CSV, caching it as float32 .npy next to the source"""
+        npy_path = path + '.npy'
+        if os.path.exists(npy_path) and os.path.getmtime(npy_path) >= os.path.getmtime(path):
+            return np.load(npy_path, mmap_mode='r')
+        
+        arr = pd.read_csv(path, header=None, dtype=np.float32).to_numpy()
+        np.save(npy_path, arr)
+        return arr
+    
     def train_ecg_heartbeat_model(self) -> Dict:
         """Train ECG heartbeat classification model"""
         self.logger.info("Training ECG Heartbeat Classification Model...")
@@ -95,66 +347,91 @@ class MedicalDatasetTrainer:
             if not (os.path.exists(train_path) and os.path.exists(test_path)):
                 raise FileNotFoundError("ECG dataset files not found")
             
-            # Load data
-            train_data = pd.read_csv(train_path, header=None)
-            test_data = pd.read_csv(test_path, header=None)
+            dataset_hash = self._dataset_hash(train_path, test_path)
+            cached = self._load_cached_metadata('ecg_heartbeat', "ecg_heartbeat_metadata.json", dataset_hash)
+            if cached:
+                return cached
+            
+            # Load data (memory-mapped from the .npy cache after the first run)
+            train_data = self._load_or_cache_csv(train_path)
+            test_data = self._load_or_cache_csv(test_path)
             
             self.logger.info(f"Loaded ECG data: Train {train_data.shape}, Test {test_data.shape}")
             
             # Prepare features and labels
-            X_train = train_data.iloc[:, :-1].values
-            y_train = train_data.iloc[:, -1].values
-            X_test = test_data.iloc[:, :-1].values
-            y_test = test_data.iloc[:, -1].values
-            
-            # Normalize features
-            scaler = StandardScaler()
+            X_train = train_data[:, :-1]
+            y_train = train_data[:, -1].astype(np.int8)
+            X_test = test_data[:, :-1]
+            y_test = test_data[:, -1].astype(np.int8)
+            
+            # Drop near-constant columns (zero-padded beat tails), then normalize.
+            # Selection runs on raw amplitudes since scaling makes every variance 1;
+            # both steps are saved together so inference keeps calling scaler.transform
+            scaler = make_pipeline(VarianceThreshold(threshold=1e-4), StandardScaler())
             X_train_scaled = scaler.fit_transform(X_train)
             X_test_scaled = scaler.transform(X_test)
+            self.logger.info(f"Selected {X_train_scaled.shape[1]} of {X_train.shape[1]} ECG features")
+            
+            # Scaler returns float64; trees split in float32, so cast once up front
+            X_train_scaled = np.ascontiguousarray(X_train_scaled, dtype=np.float32)
+            X_test_scaled = np.ascontiguousarray(X_test_scaled, dtype=np.float32)
             
             # Train multiple models (OPTIMIZED - no slow Gradient Boosting)
+            # Random forest trees are sharded across processes in fit_rf_sharded
             models = {
-                'random_forest': RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1),
-                'logistic_regression': LogisticRegression(random_state=42, max_iter=1000)
+                'random_forest': None,
+                'logistic_regression': LogisticRegression(random_state=42, max_iter=1000, tol=1e-3)
                 # Removed gradient_boosting - too slow for large datasets
             }
             
-            results = {}
+            results: List[ModelResult] = []
             for name, model in models.items():
                 self.logger.info(f"Training {name}...")
-                model.fit(X_train_scaled, y_train)
+                if name == 'random_forest':
+                    # Per-bootstrap class weights offset the dominance of normal beats
+                    model = fit_rf_sharded(X_train_scaled, y_train, total=100, class_weight='balanced_subsample')
+                else:
+                    model.fit(X_train_scaled, y_train)
                 
                 # Evaluate
                 train_score = model.score(X_train_scaled, y_train)
                 test_score = model.score(X_test_scaled, y_test)
                 
-                results[name] = {
-                    'model': model,
-                    'train_accuracy': train_score,
-                    'test_accuracy': test_score,
-                    'scaler': scaler
-                }
+                results.append(ModelResult(name, model, test_score, train_acc=train_score, scaler=scaler))
                 
                 self.logger.info(f"{name}: Train={train_score:.4f}, Test={test_score:.4f}")
             
             # Select best model
-            best_model_name = max(results.keys(), key=lambda k: results[k]['test_accuracy'])
-            best_model_info = results[best_model_name]
+            best = max(results, key=attrgetter('test_acc'))
+            
+            # Release the losing models before saving
+            results.clear()
+            models.clear()
             
             # Save best model
             model_path = os.path.join(self.models_dir, "ecg_heartbeat_model.joblib")
             scaler_path = os.path.join(self.models_dir, "ecg_heartbeat_scaler.joblib")
             
-            joblib.dump(best_model_info['model'], model_path)
-            joblib.dump(best_model_info['scaler'], scaler_path)
+            joblib.dump(best.model, model_path, compress=MODEL_COMPRESS)
+            joblib.dump(best.scaler, scaler_path)
+            
+            # Lean 8-bit forest for bandwidth-bound predict (thresholds as bin indices)
+            quantized_path = None
+            if best.name == 'random_forest':
+                quantized_path = os.path.join(self.models_dir, "ecg_heartbeat_quantized.joblib")
+                quantized = quantize_forest(best.model, X_train_scaled)
+                quantized_acc = (predict_quantized(bin_features(X_test_scaled, quantized['bin_edges']), quantized) == y_test).mean()
+                joblib.dump(quantized, quantized_path)
+                self.logger.info(f"Quantized forest saved: Test={quantized_acc:.4f}")
             
             # Save model metadata
             metadata = {
                 'model_type': 'ecg_heartbeat',
-                'best_algorithm': best_model_name,
-                'train_accuracy': best_model_info['train_accuracy'],
-                'test_accuracy': best_model_info['test_accuracy'],
+                'best_algorithm': best.name,
+                'train_accuracy': best.train_acc,
+                'test_accuracy': best.test_acc,
                 'feature_count': X_train.shape[1],
+                'selected_feature_count': X_train_scaled.shape[1],
                 'class_labels': {
                     0: 'Normal heartbeat',
                     1: 'Supraventricular premature',
@@ -163,15 +440,20 @@ class MedicalDatasetTrainer:
                     4: 'Unclassifiable beat'
                 },
                 'trained_at': datetime.now().isoformat(),
+                'dataset_hash': dataset_hash,
                 'model_path': model_path,
+                'model_compression': MODEL_COMPRESS[0],
                 'scaler_path': scaler_path
             }
             
+            if quantized_path:
+                metadata['quantized_path'] = quantized_path
+            
             with open(os.path.join(self.models_dir, "ecg_heartbeat_metadata.json"), 'w') as f:
                 json.dump(metadata, f, indent=2)
             
             self.trained_models['ecg_heartbeat'] = metadata
-            self.logger.info(f"ECG model saved: {best_model_name} with {best_model_info['test_accuracy']:.4f} accuracy")
+            self.logger.info(f"ECG model saved: {best.name} with {best.test_acc:.4f} accuracy")
             
             return metadata
             
@@ -179,8 +461,8 @@ class MedicalDatasetTrainer:
             self.logger.error(f"ECG training failed: {str(e)}")
             raise
     
-    def train_diabetes_model(self) -> Dict:
-        """Train diabetes prediction model"""
+    def train_diabetes_model(self, verbose_cv: bool = False) -> Dict:
+        """Train diabetes prediction model (5-fold CV only when verbose_cv is set)"""
         self.logger.info("Training Diabetes Prediction Model...")
         
         try:
@@ -190,6 +472,11 @@ class MedicalDatasetTrainer:
             if not os.path.exists(data_path):
                 raise FileNotFoundError("Diabetes dataset not found")
             
+            dataset_hash = self._dataset_hash(data_path)
+            cached = self._load_cached_metadata('diabetes', "diabetes_metadata.json", dataset_hash)
+            if cached:
+                return cached
+            
             # Load data
             data = pd.read_csv(data_path)
             self.logger.info(f"Loaded diabetes data: {data.shape}")
@@ -206,53 +493,62 @@ class MedicalDatasetTrainer:
             X_train_scaled = scaler.fit_transform(X_train)
             X_test_scaled = scaler.transform(X_test)
             
+            # Scaler returns float64; trees split in float32, so cast once up front
+            X_train_scaled = np.ascontiguousarray(X_train_scaled, dtype=np.float32)
+            X_test_scaled = np.ascontiguousarray(X_test_scaled, dtype=np.float32)
+            
             # Train models (OPTIMIZED - faster training)
             models = {
-                'random_forest': RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1),
-                'logistic_regression': LogisticRegression(random_state=42, max_iter=500)
+                'random_forest': RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=PHYS),
+                'logistic_regression': LogisticRegression(random_state=42, max_iter=500, tol=1e-3)
                 # Removed slow models for faster training
             }
             
-            results = {}
+            results: List[ModelResult] = []
             for name, model in models.items():
                 self.logger.info(f"Training {name}...")
                 model.fit(X_train_scaled, y_train)
                 
-                # Cross-validation
-                cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=5)
                 test_score = model.score(X_test_scaled, y_test)
                 
-                results[name] = {
-                    'model': model,
-                    'cv_mean': cv_scores.mean(),
-                    'cv_std': cv_scores.std(),
-                    'test_accuracy': test_score,
-                    'scaler': scaler
-                }
+                result = ModelResult(name, model, test_score, scaler=scaler)
+                results.append(result)
                 
-                self.logger.info(f"{name}: CV={cv_scores.mean():.4f}±{cv_scores.std():.4f}, Test={test_score:.4f}")
+                # Cross-validation (refits the model 5x, so reporting only)
+                if verbose_cv:
+                    cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=5, n_jobs=5)
+                    result.cv_mean = cv_scores.mean()
+                    result.cv_std = cv_scores.std()
+                    self.logger.info(f"{name}: CV={cv_scores.mean():.4f}±{cv_scores.std():.4f}, Test={test_score:.4f}")
+                else:
+                    self.logger.info(f"{name}: Test={test_score:.4f}")
             
             # Select best model
-            best_model_name = max(results.keys(), key=lambda k: results[k]['test_accuracy'])
-            best_model_info = results[best_model_name]
+            best = max(results, key=attrgetter('test_acc'))
+            
+            # Release the losing models before saving
+            results.clear()
+            models.clear()
             
             # Save best model
             model_path = os.path.join(self.models_dir, "diabetes_model.joblib")
             scaler_path = os.path.join(self.models_dir, "diabetes_scaler.joblib")
             
-            joblib.dump(best_model_info['model'], model_path)
-            joblib.dump(best_model_info['scaler'], scaler_path)
+            joblib.dump(best.model, model_path, compress=MODEL_COMPRESS)
+            joblib.dump(best.scaler, scaler_path)
             
             # Save metadata
             metadata = {
                 'model_type': 'diabetes_prediction',
-                'best_algorithm': best_model_name,
-                'cv_accuracy': best_model_info['cv_mean'],
-                'test_accuracy': best_model_info['test_accuracy'],
+                'best_algorithm': best.name,
+                'cv_accuracy': best.cv_mean,
+                'test_accuracy': best.test_acc,
                 'features': list(X.columns),
                 'classes': {0: 'No diabetes', 1: 'Diabetes'},
                 'trained_at': datetime.now().isoformat(),
+                'dataset_hash': dataset_hash,
                 'model_path': model_path,
+                'model_compression': MODEL_COMPRESS[0],
                 'scaler_path': scaler_path
             }
             
@@ -260,7 +556,7 @@ class MedicalDatasetTrainer:
                 json.dump(metadata, f, indent=2)
             
             self.trained_models['diabetes'] = metadata
-            self.logger.info(f"Diabetes model saved: {best_model_name} with {best_model_info['test_accuracy']:.4f} accuracy")
+            self.logger.info(f"Diabetes model saved: {best.name} with {best.test_acc:.4f} accuracy")
             
             return metadata
             
@@ -270,23 +566,32 @@ class MedicalDatasetTrainer:
     
     def preprocess_medical_text(self, text: str) -> str:
         """Preprocess medical transcription text"""
-        if not NLP_AVAILABLE or not text:
-            return text.lower() if text else ""
+        return _preprocess_medical_text(text, getattr(self, 'lemmatizer', None), getattr(self, 'stop_words', None))
+    
+    def preprocess_medical_texts_batch(self, texts: List[str]) -> List[str]:
+        """Preprocess many texts in one spaCy nlp.pipe pass, reusing the on-disk cache across runs"""
+        return self._preprocess_spacy_cached(texts)
+    
+    def preprocess_medical_texts(self, texts: List[str], chunk_size: int = 500) -> List[str]:
+        """Preprocess many texts in parallel, reusing the on-disk cache across runs"""
+        if self.text_preprocessor == 'spacy':
+            return self.preprocess_medical_texts_batch(texts)
         
-        try:
-            # Tokenize
-            tokens = word_tokenize(text.lower())
-            
-            # Remove stopwords and lemmatize
-            processed_tokens = [
-                self.lemmatizer.lemmatize(token) 
-                for token in tokens 
-                if token.isalpha() and token not in self.stop_words
-            ]
-            
-            return ' '.join(processed_tokens)
-        except:
-            return text.lower()
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        processed = joblib.Parallel(n_jobs=PHYS, backend="loky")(
+            joblib.delayed(self._preprocess_batch_cached)(chunk) for chunk in chunks
+        )
+        return [text for chunk in processed for text in chunk]
+    
+    def _partial_fit_batches(self, model, X, y, classes, batch_size: int = 256, epochs: int = 5):
+        """Fit an incremental estimator over shuffled row mini-batches"""
+        rng = np.random.default_rng(42)
+        for _ in range(epochs):
+            order = rng.permutation(X.shape[0])
+            for batch in gen_batches(X.shape[0], batch_size):
+                rows = order[batch]
+                model.partial_fit(X[rows], y[rows], classes=classes)
+        return model
     
     def train_medical_text_classifier(self) -> Dict:
         """Train medical transcription classifier"""
@@ -299,6 +604,12 @@ class MedicalDatasetTrainer:
             if not os.path.exists(data_path):
                 raise FileNotFoundError("Medical transcriptions dataset not found")
             
+            dataset_hash = self._dataset_hash(data_path)
+            cached = self._load_cached_metadata('medical_text', "medical_text_metadata.json", dataset_hash)
+            # Retrain models from another (or an unrecorded) preprocessor
+            if cached and cached.get('text_preprocessor') == self.text_preprocessor:
+                return cached
+            
             # Load data
             data = pd.read_csv(data_path)
             self.logger.info(f"Loaded medical transcriptions: {data.shape}")
@@ -314,84 +625,96 @@ class MedicalDatasetTrainer:
                 
                 # Preprocess text
                 self.logger.info("Preprocessing medical texts...")
-                filtered_data['processed_text'] = filtered_data['transcription'].apply(self.preprocess_medical_text)
+                filtered_data['processed_text'] = self.preprocess_medical_texts(filtered_data['transcription'].tolist())
                 
-                # Prepare features using TF-IDF
-                from sklearn.feature_extraction.text import TfidfVectorizer
+                # Prepare features using hashed n-grams + IDF reweighting (no vocabulary dict)
+                from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
                 
-                vectorizer = TfidfVectorizer(
-                    max_features=2000,  # Reduced for faster training
-                    ngram_range=(1, 2),
-                    min_df=2,
-                    max_df=0.8
+                vectorizer = make_pipeline(
+                    HashingVectorizer(
+                        n_features=2 ** 18,
+                        ngram_range=(1, 2),
+                        norm=None,
+                        alternate_sign=False,
+                        dtype=np.float32
+                    ),
+                    TfidfTransformer(sublinear_tf=True)
                 )
                 
-                X = vectorizer.fit_transform(filtered_data['processed_text'])
+                # float32 CSR end to end halves SpMV bandwidth in both fits
+                X = vectorizer.fit_transform(filtered_data['processed_text']).tocsr()
                 y = filtered_data['medical_specialty']
                 
                 # Encode labels
                 label_encoder = LabelEncoder()
                 y_encoded = label_encoder.fit_transform(y)
                 
-                # Split data
-                X_train, X_test, y_train, y_test = train_test_split(
-                    X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-                )
+                # Split data (one stratified index split, then a single CSR row gather each)
+                splitter = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+                train_idx, test_idx = next(splitter.split(np.zeros(len(y_encoded)), y_encoded))
+                X_train, X_test = X[train_idx], X[test_idx]
+                y_train, y_test = y_encoded[train_idx], y_encoded[test_idx]
                 
                 # Train models (OPTIMIZED - no slow gradient boosting)
+                # Logistic regression is fitted with SGD over mini-batches (log loss)
                 models = {
-                    'random_forest': RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1),
-                    'logistic_regression': LogisticRegression(random_state=42, max_iter=1000)
+                    'random_forest': RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=PHYS),
+                    'logistic_regression': SGDClassifier(loss="log_loss", random_state=42, n_jobs=PHYS)
                 }
                 
-                results = {}
+                results: List[ModelResult] = []
                 for name, model in models.items():
                     self.logger.info(f"Training {name}...")
-                    model.fit(X_train, y_train)
+                    if isinstance(model, SGDClassifier):
+                        self._partial_fit_batches(model, X_train, y_train, classes=np.unique(y_encoded))
+                    else:
+                        model.fit(X_train, y_train)
                     
                     train_score = model.score(X_train, y_train)
                     test_score = model.score(X_test, y_test)
                     
-                    results[name] = {
-                        'model': model,
-                        'train_accuracy': train_score,
-                        'test_accuracy': test_score
-                    }
+                    results.append(ModelResult(name, model, test_score, train_acc=train_score))
                     
                     self.logger.info(f"{name}: Train={train_score:.4f}, Test={test_score:.4f}")
                 
                 # Select best model
-                best_model_name = max(results.keys(), key=lambda k: results[k]['test_accuracy'])
-                best_model_info = results[best_model_name]
+                best = max(results, key=attrgetter('test_acc'))
+                
+                # Release the losing models before saving
+                results.clear()
+                models.clear()
                 
                 # Save model
                 model_path = os.path.join(self.models_dir, "medical_text_model.joblib")
                 vectorizer_path = os.path.join(self.models_dir, "medical_text_vectorizer.joblib")
                 encoder_path = os.path.join(self.models_dir, "medical_text_encoder.joblib")
                 
-                joblib.dump(best_model_info['model'], model_path)
+                joblib.dump(best.model, model_path, compress=MODEL_COMPRESS)
                 joblib.dump(vectorizer, vectorizer_path)
                 joblib.dump(label_encoder, encoder_path)
                 
                 # Save metadata
                 metadata = {
                     'model_type': 'medical_text_classification',
-                    'best_algorithm': best_model_name,
-                    'train_accuracy': best_model_info['train_accuracy'],
-                    'test_accuracy': best_model_info['test_accuracy'],
+                    'best_algorithm': best.name,
+                    'train_accuracy': best.train_acc,
+                    'test_accuracy': best.test_acc,
                     'specialties': list(label_encoder.classes_),
                     'feature_count': X.shape[1],
                     'trained_at': datetime.now().isoformat(),
+                    'dataset_hash': dataset_hash,
                     'model_path': model_path,
+                    'model_compression': MODEL_COMPRESS[0],
                     'vectorizer_path': vectorizer_path,
-                    'encoder_path': encoder_path
+                    'encoder_path': encoder_path,
+                    'text_preprocessor': self.text_preprocessor
                 }
                 
                 with open(os.path.join(self.models_dir, "medical_text_metadata.json"), 'w') as f:
                     json.dump(metadata, f, indent=2)
                 
                 self.trained_models['medical_text'] = metadata
-                self.logger.info(f"Medical text model saved: {best_model_name} with {best_model_info['test_accuracy']:.4f} accuracy")
+                self.logger.info(f"Medical text model saved: {best.name} with {best.test_acc:.4f} accuracy")
                 
                 return metadata
         
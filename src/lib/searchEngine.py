@@ -6,19 +6,29 @@ Provides unified search across medical datasets
 
 import os
 import json
+import pickle
+import hashlib
 import numpy as np
+import pandas as pd
 import faiss
 from pathlib import Path
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, Iterator, List, Any, Tuple, Optional, Union
 import logging
 from datetime import datetime
 import asyncio
+import math
+import heapq
+import threading
+from collections import OrderedDict
+from itertools import chain, islice
+from operator import itemgetter
 
 # MongoDB
 try:
     from pymongo import MongoClient
     from motor.motor_asyncio import AsyncIOMotorClient
     import pymongo
+    from bson import Binary
 except ImportError:
     print("MongoDB dependencies missing. Install with: pip install pymongo motor")
 
@@ -31,7 +41,126 @@ try:
 except ImportError:
     print("Missing ML dependencies")
 
-from loadData import MedicalDatasetLoader
+# Lets GPU FAISS indexes search torch CUDA tensors directly (optional)
+try:
+    import torch.nn.functional as F
+    import faiss.contrib.torch_utils
+    FAISS_TORCH_AVAILABLE = True
+except ImportError:
+    FAISS_TORCH_AVAILABLE = False
+
+# BLAKE3 for dataset fingerprints (optional, falls back to hashlib BLAKE2)
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+# Numba JIT for the per-dataset tally (optional)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+from loadData import MedicalDatasetLoader, TEXT_MODEL_NAME, IMAGE_MODEL_NAME
+
+# Below this many vectors brute-force IndexFlatIP beats a graph index
+HNSW_MIN_ITEMS = 5_000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Above this many vectors HNSW storage gets too large; use IVF-PQ codes
+IVF_MIN_ITEMS = 1_000_000
+IVF_NPROBE = 32
+
+# Encoded query vectors kept in the LRU cache
+QUERY_CACHE_SIZE = 1024
+
+# Documents per MongoDB insert_many round trip
+MONGO_BATCH_SIZE = 1000
+
+# cuVS CAGRA graph settings (GPU builds with Faiss >= 1.10)
+CAGRA_GRAPH_DEGREE = 32
+CAGRA_INTERMEDIATE_GRAPH_DEGREE = 64
+
+# Bump when _build_index changes index types or tiers, so saved indexes are rebuilt
+INDEX_LAYOUT_VERSION = 2
+
+def encode_embedding(vector: np.ndarray) -> "Binary":
+    """Pack an embedding as raw float32 bytes (about 4x smaller than a BSON double array)"""
+    return Binary(np.asarray(vector, dtype=np.float32).tobytes(), subtype=0)
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """Inverse of encode_embedding"""
+    return np.frombuffer(data, dtype=np.float32)
+
+# Fields returned for each search hit, in order
+RESULT_COLUMNS = ['id', 'dataset', 'type', 'content', 'snippet', 'metadata', 'file_path']
+
+def _mapping_frame(mapping: List[Dict[str, Any]], ids: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """Columnar (one column per field) copy of an index mapping, indexed by FAISS id"""
+    frame = pd.DataFrame(mapping, columns=RESULT_COLUMNS, index=ids)
+    frame['file_path'] = frame['file_path'].fillna('')
+    return frame
+
+def stable_ids(items: List[Dict[str, Any]]) -> np.ndarray:
+    """Stable non-negative int64 FAISS ids derived from each item's id"""
+    return np.array([
+        int.from_bytes(hashlib.blake2b(str(item['id']).encode(), digest_size=8).digest(), 'little') & 0x7FFF_FFFF_FFFF_FFFF
+        for item in items
+    ], dtype=np.int64)
+
+def data_fingerprint(items: List[Dict[str, Any]], config: str = "") -> str:
+    """Fingerprint of indexed items (ids, full content, file paths) and the index configuration"""
+    h = blake3.blake3() if BLAKE3_AVAILABLE else hashlib.blake2b()
+    h.update(f"{config}\n".encode())
+    for item in items:
+        content = str(item['content']).encode()
+        h.update(f"{item['id']}|{item.get('file_path') or ''}|{len(content)}|".encode())
+        h.update(content)
+    return h.hexdigest()
+
+def _base_index(index):
+    """The index wrapped by an IndexIDMap2 (or the index itself)"""
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+def _index_ids(index) -> Optional[np.ndarray]:
+    """Ids stored in an IndexIDMap2, or None for indexes that use positions as ids"""
+    return faiss.vector_to_array(index.id_map) if isinstance(index, faiss.IndexIDMap) else None
+
+def _set_ids(id_index, ids: np.ndarray):
+    """Attach ids to an IndexIDMap2 whose wrapped index was populated directly"""
+    id_index.ntotal = id_index.index.ntotal
+    faiss.copy_array_to_vector(np.ascontiguousarray(ids, dtype=np.int64), id_index.id_map)
+
+def _cagra_cpu_index(copy_to, ids: np.ndarray):
+    """
+    IndexIDMap2 over a CPU IndexHNSWCagra filled by copy_to (GpuIndexCagra.copyTo).
+    FAISS only wraps empty indexes, so the wrapper is created first and filled through.
+    """
+    cpu_index = faiss.IndexIDMap2(faiss.IndexHNSWCagra())
+    cpu_base = faiss.downcast_index(cpu_index.index)
+    copy_to(cpu_base)
+    cpu_index.d, cpu_index.metric_type = cpu_base.d, cpu_base.metric_type
+    _set_ids(cpu_index, ids)
+    return cpu_index
+    id_index.construct_rev_map()
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _tally(dataset_codes: np.ndarray, type_codes: np.ndarray, n_datasets: int, n_types: int) -> np.ndarray:
+        """Count items per (dataset, type) code pair in a single pass"""
+        counts = np.zeros((n_datasets, n_types), dtype=np.int64)
+        for i in range(dataset_codes.shape[0]):
+            counts[dataset_codes[i], type_codes[i]] += 1
+        return counts
+else:
+    def _tally(dataset_codes: np.ndarray, type_codes: np.ndarray, n_datasets: int, n_types: int) -> np.ndarray:
+        """Count items per (dataset, type) code pair in a single pass"""
+        flat = dataset_codes.astype(np.int64) * n_types + type_codes
+        return np.bincount(flat, minlength=n_datasets * n_types).reshape(n_datasets, n_types)
 
 class MedicalSearchEngine:
     """
@@ -42,7 +171,9 @@ class MedicalSearchEngine:
                  datasets_dir: str = "datasets",
                  mongo_uri: str = None,
                  cache_dir: str = "search_cache",
-                 collection_name: str = "medical_search_index"):
+                 collection_name: str = "medical_search_index",
+                 store_vector_array: bool = False,
+                 compile_clip: Optional[bool] = None):
         
         self.datasets_dir = Path(datasets_dir)
         self.cache_dir = Path(cache_dir)
@@ -51,45 +182,77 @@ class MedicalSearchEngine:
         # Initialize loader
         self.loader = MedicalDatasetLoader(str(datasets_dir), str(cache_dir))
         
-        # Vector indexes
+        # Vector indexes (moved onto the GPU when FAISS was built with CUDA)
         self.text_index = None
         self.image_index = None
+        self.use_gpu = hasattr(faiss, 'StandardGpuResources') and faiss.get_num_gpus() > 0
+        self._gpu_res = None
+        self._gpu_lock = threading.Lock()  # text and image indexes build on separate threads
         
         # Data mappings (FAISS index -> data item)
         self.text_mapping = []
         self.image_mapping = []
         
+        # float32 embeddings from the last build, kept until pushed to MongoDB
+        # (the indexes may only hold lossy quantized codes)
+        self.text_embeddings = None
+        self.image_embeddings = None
+        
+        # Columnar views of the mappings for result lookup and stats
+        self.text_df = _mapping_frame([])
+        self.image_df = _mapping_frame([])
+        
+        # Integer dataset/type codes over both mappings, used by get_dataset_stats
+        self._dataset_codes = np.empty(0, dtype=np.uint16)
+        self._type_codes = np.empty(0, dtype=np.uint16)
+        self._dataset_names = []
+        self._type_names = []
+        
         # MongoDB setup
         self.mongo_client = None
         self.db = None
         self.collection = None
         self.collection_name = collection_name
+        self.mongo_uri = mongo_uri  # connected in initialize_search_engine
         
-        if mongo_uri:
-            self.setup_mongodb(mongo_uri)
+        # Embeddings are stored once per document: float32 BSON binary (embedding) by
+        # default, or the numeric array Atlas $vectorSearch needs (embedding_vec) instead
+        self.store_vector_array = store_vector_array
         
         # Models
         self.text_model = None
         self.image_model = None
+        self._clip_encode_text = None  # CLIP text tower, resolved on first use by _clip_text_encoder
+        
+        # torch.compile pays off only in long-lived processes (the search API spawns one per
+        # request), so it is opt-in via compile_clip or SEARCH_COMPILE_CLIP=1
+        if compile_clip is None:
+            compile_clip = os.getenv('SEARCH_COMPILE_CLIP') == '1'
+        self.compile_clip = compile_clip
+        
+        # LRU cache of normalized query vectors, keyed by (model kind, query)
+        self._query_cache = OrderedDict()
         
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
-    def setup_mongodb(self, mongo_uri: str):
-        """Setup MongoDB connection"""
+    async def setup_mongodb(self, mongo_uri: str):
+        """Setup async MongoDB connection"""
         try:
-            self.mongo_client = MongoClient(mongo_uri)
+            self.mongo_client = AsyncIOMotorClient(mongo_uri)
             self.db = self.mongo_client.healthcare_app
             self.collection = self.db[self.collection_name]
             
-            # Create vector search index (if using MongoDB Atlas with vector search)
+            # Compound index for dataset/type filters. Embeddings are not indexed here:
+            # Atlas $vectorSearch uses a separate "vector_index" configured in Atlas.
             try:
-                # Create index for text embeddings
-                self.collection.create_index([
-                    ("embedding", "2dsphere"),
-                    ("dataset", 1),
-                    ("type", 1)
-                ], background=True)
+                # Drop the 2dsphere index older versions built on the (non-GeoJSON) embeddings
+                for name, info in (await self.collection.index_information()).items():
+                    if any(kind == "2dsphere" for _, kind in info['key']):
+                        await self.collection.drop_index(name)
+                        self.logger.info(f"Dropped stale 2dsphere index {name}")
+                
+                await self.collection.create_index([("dataset", 1), ("type", 1)], background=True)
                 self.logger.info("MongoDB indexes created")
             except Exception as e:
                 self.logger.warning(f"Index creation warning: {e}")
@@ -102,12 +265,17 @@ class MedicalSearchEngine:
         """Initialize the complete search engine"""
         self.logger.info("Initializing Medical Search Engine...")
         
+        if self.mongo_uri and self.collection is None:
+            await self.setup_mongodb(self.mongo_uri)
+        
         # Initialize models
         if not self.loader.initialize_models():
             raise RuntimeError("Failed to initialize ML models")
         
         self.text_model = self.loader.text_model
         self.image_model = self.loader.image_model
+        self._clip_encode_text = None  # belongs to the previous CLIP model
+        self._query_cache.clear()  # cached vectors belong to the previous models
         
         # Check for cached data
         if not force_rebuild and self.loader.load_data_cache():
@@ -128,29 +296,146 @@ class MedicalSearchEngine:
     async def build_search_indexes(self, force_rebuild: bool = False):
         """Build FAISS indexes and populate MongoDB"""
         
-        # Check for existing indexes
-        text_index_file = self.cache_dir / "text_index.faiss"
-        image_index_file = self.cache_dir / "image_index.faiss"
-        text_mapping_file = self.cache_dir / "text_mapping.json"
-        image_mapping_file = self.cache_dir / "image_mapping.json"
-        
-        if not force_rebuild and all(f.exists() for f in [text_index_file, image_index_file, text_mapping_file, image_mapping_file]):
-            self.logger.info("Loading existing FAISS indexes...")
+        # Fingerprint the loaded data, encoders and index layout; matching caches are reused
+        index_data = self._index_data()
+        fingerprints = {name: data_fingerprint(items, self._index_config(name)) for name, items in index_data.items()}
+        # Caches without fingerprints (written by older versions) cannot be validated and are rebuilt
+        if not force_rebuild and self._cache_matches(fingerprints, index_data):
+            self.logger.info("Loading FAISS indexes (dataset fingerprint unchanged)...")
             self.load_indexes()
             return
         
-        # Build text index
-        await self.build_text_index()
-        
-        # Build image index
-        await self.build_image_index()
+        # Build text (SBERT) and image (CLIP) indexes concurrently
+        await asyncio.gather(self.build_text_index(), self.build_image_index())
         
-        # Save indexes
-        self.save_indexes()
+        # Save indexes, then the fingerprints they were built from
+        await asyncio.to_thread(self.save_indexes)
+        for name, fingerprint in fingerprints.items():
+            self._fingerprint_file(name).write_text(fingerprint)
         
-        # Populate MongoDB
-        if self.collection:
+        # Populate MongoDB, then release the float32 embeddings
+        if self.collection is not None:
             await self.populate_mongodb()
+        self.text_embeddings = self.image_embeddings = None
+    
+    def _index_data(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Loaded items behind each index"""
+        data = self.loader.loaded_data
+        return {'text': data['csv'] + data['text'], 'image': data['image']}
+    
+    def _index_config(self, name: str) -> str:
+        """Encoder and index settings an index was built with (part of its fingerprint)"""
+        encoder = (f"{type(self.text_model).__name__}:{TEXT_MODEL_NAME}" if name == 'text'
+                   else f"clip:{IMAGE_MODEL_NAME}")
+        return (f"{encoder}|layout={INDEX_LAYOUT_VERSION}|gpu={self.use_gpu}"
+                f"|hnsw={HNSW_MIN_ITEMS},{HNSW_M},{HNSW_EF_CONSTRUCTION},{HNSW_EF_SEARCH}"
+                f"|ivf={IVF_MIN_ITEMS},{IVF_NPROBE}|cagra={CAGRA_GRAPH_DEGREE},{CAGRA_INTERMEDIATE_GRAPH_DEGREE}")
+    
+    def _fingerprint_file(self, name: str) -> Path:
+        """Fingerprint written next to an index"""
+        return self.cache_dir / f"{name}_index.fp"
+    
+    def _cache_matches(self, fingerprints: Dict[str, str], index_data: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """Whether the saved indexes were built from data with these fingerprints"""
+        for name, fingerprint in fingerprints.items():
+            fp_file = self._fingerprint_file(name)
+            if not fp_file.exists() or fp_file.read_text() != fingerprint:
+                return False
+            # Empty datasets have a fingerprint but no index
+            if index_data[name] and not ((self.cache_dir / f"{name}_index.faiss").exists() and self._mapping_exists(name)):
+                return False
+        return True
+    
+    def _build_index(self, embeddings: np.ndarray, ids: Optional[np.ndarray] = None):
+        """
+        Build an inner-product FAISS index over normalized embeddings.
+        Small corpora use exhaustive search over fp16 codes (IndexFlatIP on GPU);
+        larger ones use a cuVS CAGRA graph on GPU when available, else an HNSW
+        graph over int8 codes (the corpus is static after build), switching to
+        IVF-PQ codes only for very large corpora.
+        The index is wrapped in IndexIDMap2 so searches return the given ids
+        (positions when omitted).
+        """
+        n, dimension = embeddings.shape
+        if ids is None:
+            ids = np.arange(n, dtype=np.int64)
+        
+        if n >= HNSW_MIN_ITEMS and self.use_gpu and hasattr(faiss, 'GpuIndexCagra'):
+            config = faiss.GpuIndexCagraConfig()
+            config.graph_degree = CAGRA_GRAPH_DEGREE
+            config.intermediate_graph_degree = CAGRA_INTERMEDIATE_GRAPH_DEGREE
+            cagra = faiss.GpuIndexCagra(self._gpu_resources(), dimension, faiss.METRIC_INNER_PRODUCT, config)
+            index = faiss.IndexIDMap2(cagra)
+            cagra.train(embeddings)  # CAGRA builds its graph from the training vectors (no add)
+            _set_ids(index, ids)
+            return index
+        
+        if n < HNSW_MIN_ITEMS and self.use_gpu:
+            index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
+        elif n < HNSW_MIN_ITEMS:
+            # fp16 codes halve the memory of exact search and need no training
+            index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+        elif n < IVF_MIN_ITEMS:
+            # int8 codes: 4x smaller than float32 vectors at negligible recall cost
+            index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = HNSW_EF_SEARCH  # saved with the index by write_index
+            index.train(embeddings)  # learns the per-dimension int8 ranges
+        else:
+            nlist = int(4 * math.sqrt(n))
+            m = min(64, dimension // 4)
+            while dimension % m:
+                m -= 1
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, m, 8, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+            index.nprobe = IVF_NPROBE
+        
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, ids)
+        return self._to_gpu(index)
+    
+    def _to_gpu(self, index):
+        """Move a CPU index onto GPU 0, sharing one StandardGpuResources across indexes"""
+        if not self.use_gpu or index is None:
+            return index
+        # Plain HNSW has no GPU counterpart; only HNSW-CAGRA graphs can be cloned
+        base = _base_index(index)
+        if isinstance(base, faiss.IndexHNSW) and not isinstance(base, getattr(faiss, 'IndexHNSWCagra', ())):
+            return index
+        options = faiss.GpuClonerOptions()
+        if hasattr(options, 'use_cuvs'):
+            options.use_cuvs = True  # restores saved HNSW-CAGRA graphs as GpuIndexCagra
+        return faiss.index_cpu_to_gpu(self._gpu_resources(), 0, index, options)
+    
+    def _gpu_resources(self):
+        """Lazily create the StandardGpuResources shared by all indexes"""
+        with self._gpu_lock:
+            if self._gpu_res is None:
+                self._gpu_res = faiss.StandardGpuResources()
+            return self._gpu_res
+    
+    def _to_cpu(self, index):
+        """Return a CPU copy of a GPU index (FAISS can only serialize CPU indexes)"""
+        if not self.use_gpu or index is None:
+            return index
+        base = _base_index(index)
+        if hasattr(faiss, 'GpuIndexCagra') and isinstance(base, faiss.GpuIndexCagra):
+            # Persist the CAGRA graph as an HNSW index searchable on CPU-only hosts
+            if base is index:
+                cpu_base = faiss.IndexHNSWCagra()
+                base.copyTo(cpu_base)
+                return cpu_base
+            return _cagra_cpu_index(base.copyTo, _index_ids(index))
+        return faiss.index_gpu_to_cpu(index)
+    
+    def _item_ids(self, items: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Stable FAISS ids for items, or None (positions) if their ids are not unique"""
+        ids = stable_ids(items)
+        if len(np.unique(ids)) < len(ids):
+            self.logger.warning("Duplicate item ids; falling back to positional FAISS ids")
+            return None
+        return ids
     
     async def build_text_index(self):
         """Build FAISS index for text data"""
@@ -163,19 +448,17 @@ class MedicalSearchEngine:
             self.logger.warning("No text data found")
             return
         
-        # Generate embeddings
-        embeddings = self.loader.generate_text_embeddings(text_data)
+        # Generate embeddings off the event loop (the encoder already L2-normalizes)
+        embeddings = await asyncio.to_thread(self.loader.generate_text_embeddings, text_data)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
         
-        # Create FAISS index
-        dimension = embeddings.shape[1]
-        self.text_index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
-        
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
-        
-        # Add to index
-        self.text_index.add(embeddings.astype(np.float32))
+        # Create FAISS index and add embeddings
+        ids = self._item_ids(text_data)
+        self.text_index = await asyncio.to_thread(self._build_index, embeddings, ids)
         self.text_mapping = text_data
+        self.text_embeddings = embeddings
+        self.text_df = _mapping_frame(text_data, ids)
+        self._refresh_stats_codes()
         
         self.logger.info(f"Text index built with {len(text_data)} items")
     
@@ -189,74 +472,90 @@ class MedicalSearchEngine:
             self.logger.warning("No image data found")
             return
         
-        # Generate embeddings
-        embeddings = self.loader.generate_image_embeddings(image_data)
-        
-        # Create FAISS index
-        dimension = embeddings.shape[1]
-        self.image_index = faiss.IndexFlatIP(dimension)
+        # Generate embeddings off the event loop
+        embeddings = await asyncio.to_thread(self.loader.generate_image_embeddings, image_data)
         
-        # Normalize embeddings
+        # Normalize in place on the float32 buffer that gets indexed (no second copy)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
         faiss.normalize_L2(embeddings)
         
-        # Add to index
-        self.image_index.add(embeddings.astype(np.float32))
+        # Create FAISS index and add embeddings
+        ids = self._item_ids(image_data)
+        self.image_index = await asyncio.to_thread(self._build_index, embeddings, ids)
         self.image_mapping = image_data
+        self.image_embeddings = embeddings
+        self.image_df = _mapping_frame(image_data, ids)
+        self._refresh_stats_codes()
         
         self.logger.info(f"Image index built with {len(image_data)} items")
     
     def save_indexes(self):
         """Save FAISS indexes and mappings"""
         if self.text_index:
-            faiss.write_index(self.text_index, str(self.cache_dir / "text_index.faiss"))
-            with open(self.cache_dir / "text_mapping.json", 'w') as f:
-                json.dump(self.text_mapping, f, default=str)
+            faiss.write_index(self._to_cpu(self.text_index), str(self.cache_dir / "text_index.faiss"))
+            self._save_mapping("text", self.text_mapping)
         
         if self.image_index:
-            faiss.write_index(self.image_index, str(self.cache_dir / "image_index.faiss"))
-            with open(self.cache_dir / "image_mapping.json", 'w') as f:
-                json.dump(self.image_mapping, f, default=str)
+            faiss.write_index(self._to_cpu(self.image_index), str(self.cache_dir / "image_index.faiss"))
+            self._save_mapping("image", self.image_mapping)
         
         self.logger.info("FAISS indexes saved")
     
+    def _mapping_exists(self, name: str) -> bool:
+        """Whether a mapping cache exists in the pickle or legacy JSON format"""
+        return any((self.cache_dir / f"{name}_mapping{ext}").exists() for ext in (".pkl", ".json"))
+    
+    def _save_mapping(self, name: str, mapping: List[Dict[str, Any]]):
+        """Save an index mapping with pickle protocol 5 (much faster than JSON for large mappings)"""
+        with open(self.cache_dir / f"{name}_mapping.pkl", 'wb') as f:
+            pickle.dump(mapping, f, protocol=5)
+    
+    def _load_mapping(self, name: str) -> List[Dict[str, Any]]:
+        """Load an index mapping, falling back to JSON caches written by older versions"""
+        pickle_file = self.cache_dir / f"{name}_mapping.pkl"
+        if pickle_file.exists():
+            with open(pickle_file, 'rb') as f:
+                return pickle.load(f)
+        
+        with open(self.cache_dir / f"{name}_mapping.json", 'r') as f:
+            return json.load(f)
+    
     def load_indexes(self):
         """Load FAISS indexes and mappings"""
         try:
             # Load text index
             if (self.cache_dir / "text_index.faiss").exists():
-                self.text_index = faiss.read_index(str(self.cache_dir / "text_index.faiss"))
-                with open(self.cache_dir / "text_mapping.json", 'r') as f:
-                    self.text_mapping = json.load(f)
+                self.text_index = self._to_gpu(faiss.read_index(str(self.cache_dir / "text_index.faiss")))
+                self.text_mapping = self._load_mapping("text")
+                self.text_df = _mapping_frame(self.text_mapping, _index_ids(self.text_index))
             
             # Load image index
             if (self.cache_dir / "image_index.faiss").exists():
-                self.image_index = faiss.read_index(str(self.cache_dir / "image_index.faiss"))
-                with open(self.cache_dir / "image_mapping.json", 'r') as f:
-                    self.image_mapping = json.load(f)
+                self.image_index = self._to_gpu(faiss.read_index(str(self.cache_dir / "image_index.faiss")))
+                self.image_mapping = self._load_mapping("image")
+                self.image_df = _mapping_frame(self.image_mapping, _index_ids(self.image_index))
             
+            self._refresh_stats_codes()
             self.logger.info("FAISS indexes loaded successfully")
         
         except Exception as e:
             self.logger.error(f"Error loading indexes: {e}")
     
-    async def populate_mongodb(self):
-        """Populate MongoDB with search data"""
-        if not self.collection:
-            self.logger.warning("MongoDB not configured")
+    def _iter_documents(self, mapping: List[Dict[str, Any]], embeddings: Optional[np.ndarray]) -> Iterator[Dict[str, Any]]:
+        """Yield MongoDB documents for indexed items with their build-time float32 embeddings"""
+        if embeddings is None:
             return
         
-        self.logger.info("Populating MongoDB with search data...")
-        
-        # Clear existing data
-        self.collection.delete_many({})
-        
-        # Insert all data
-        all_documents = []
-        
-        # Add text data with embeddings
-        for i, item in enumerate(self.text_mapping):
-            if self.text_index and i < self.text_index.ntotal:
-                embedding = self.text_index.reconstruct(i).tolist()
+        total = min(len(mapping), len(embeddings))
+        for start in range(0, total, MONGO_BATCH_SIZE):
+            stop = min(start + MONGO_BATCH_SIZE, total)
+            batch = embeddings[start:stop]
+            vector_lists = batch.tolist() if self.store_vector_array else None
+            for offset, item in enumerate(mapping[start:stop]):
+                if vector_lists is not None:
+                    embedding_field = {'embedding_vec': vector_lists[offset]}
+                else:
+                    embedding_field = {'embedding': encode_embedding(batch[offset])}
                 doc = {
                     '_id': item['id'],
                     'dataset': item['dataset'],
@@ -265,142 +564,216 @@ class MedicalSearchEngine:
                     'snippet': item['snippet'],
                     'metadata': item['metadata'],
                     'file_path': item['file_path'],
-                    'embedding': embedding,
+                    **embedding_field,
                     'created_at': datetime.utcnow()
                 }
-                all_documents.append(doc)
+                yield doc
+    
+    async def populate_mongodb(self):
+        """Populate MongoDB with search data"""
+        if self.collection is None:
+            self.logger.warning("MongoDB not configured")
+            return
         
-        # Add image data with embeddings
-        for i, item in enumerate(self.image_mapping):
-            if self.image_index and i < self.image_index.ntotal:
-                embedding = self.image_index.reconstruct(i).tolist()
-                doc = {
-                    '_id': item['id'],
-                    'dataset': item['dataset'],
-                    'type': item['type'],
-                    'content': item['content'],
-                    'snippet': item['snippet'],
-                    'metadata': item['metadata'],
-                    'file_path': item['file_path'],
-                    'embedding': embedding,
-                    'created_at': datetime.utcnow()
-                }
-                all_documents.append(doc)
+        # Indexes loaded from cache carry no float32 embeddings; keep the existing documents
+        if (self.text_mapping and self.text_embeddings is None) or (self.image_mapping and self.image_embeddings is None):
+            self.logger.warning("No build-time embeddings available; rebuild the indexes to populate MongoDB")
+            return
         
-        # Batch insert
-        if all_documents:
-            try:
-                self.collection.insert_many(all_documents, ordered=False)
-                self.logger.info(f"Inserted {len(all_documents)} documents into MongoDB")
-            except Exception as e:
-                self.logger.error(f"MongoDB insertion error: {e}")
+        self.logger.info("Populating MongoDB with search data...")
+        
+        # Clear existing data
+        await self.collection.delete_many({})
+        
+        # Stream text and image documents in fixed-size batches
+        documents = chain(
+            self._iter_documents(self.text_mapping, self.text_embeddings),
+            self._iter_documents(self.image_mapping, self.image_embeddings)
+        )
+        
+        inserted = 0
+        try:
+            while True:
+                batch = list(islice(documents, MONGO_BATCH_SIZE))
+                if not batch:
+                    break
+                await self.collection.insert_many(batch, ordered=False, bypass_document_validation=True)
+                inserted += len(batch)
+            self.logger.info(f"Inserted {inserted} documents into MongoDB")
+        except Exception as e:
+            self.logger.error(f"MongoDB insertion error after {inserted} documents: {e}")
     
-    async def search(self, query: str, top_k: int = 5, search_types: List[str] = None) -> List[Dict[str, Any]]:
+    async def search(self, query: Union[str, List[str]], top_k: int = 5, search_types: List[str] = None) -> List[Any]:
         """
         Unified search across all datasets
         
         Args:
-            query: Search query text
+            query: Search query text, or a list of queries to search in one batch
             top_k: Number of top results to return
             search_types: Types to search ['csv', 'text', 'image'] or None for all
         
         Returns:
-            List of search results
+            List of search results (one list per query when given a list)
         """
         if search_types is None:
             search_types = ['csv', 'text', 'image']
         
-        results = []
+        single = isinstance(query, str)
+        queries = [query] if single else list(query)
+        sources = []
         
         # Text search (includes CSV data)
         if any(t in search_types for t in ['csv', 'text']):
-            text_results = await self.search_text(query, top_k)
-            results.extend(text_results)
+            sources.append(await self.search_text(queries, top_k))
         
         # Image search
         if 'image' in search_types:
-            image_results = await self.search_images(query, top_k)
-            results.extend(image_results)
+            sources.append(await self.search_images(queries, top_k))
         
-        # Sort by relevance score and return top results
-        results.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
-        return results[:top_k]
+        # Merge the per-source hits and keep the top results by relevance score
+        by_score = itemgetter('relevance_score')
+        results = [heapq.nlargest(top_k, chain.from_iterable(hits), key=by_score)
+                   for hits in zip(*sources)] if sources else [[] for _ in queries]
+        
+        return results[0] if single else results
     
-    async def search_text(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search text and CSV data"""
-        if not self.text_index or not self.text_model:
-            return []
+    def _search_index(self, index, frame: pd.DataFrame, queries, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search an index and return (scores, frame row positions), with -1 for misses"""
+        if not isinstance(queries, np.ndarray):
+            # CUDA tensors go to the wrapped GPU index, whose ids are positions
+            scores, positions = _base_index(index).search(queries, top_k)
+            return scores.cpu().numpy(), positions.cpu().numpy()
+        
+        scores, ids = index.search(queries, top_k)
+        positions = frame.index.get_indexer(ids.ravel()).reshape(ids.shape)
+        return scores, positions
+    
+    def _build_results(self, scores: np.ndarray, positions: np.ndarray, frame: pd.DataFrame, search_type: str) -> List[List[Dict[str, Any]]]:
+        """Turn batched (scores, row positions) into per-query result lists"""
+        batch_results = []
+        for score_row, position_row in zip(scores, positions):
+            valid = (position_row >= 0) & (position_row < len(frame))
+            results = frame.iloc[position_row[valid]].to_dict(orient='records')
+            for result, score in zip(results, score_row[valid].tolist()):
+                result['relevance_score'] = score
+                result['search_type'] = search_type
+            batch_results.append(results)
+        return batch_results
+    
+    def _query_on_device(self, index) -> bool:
+        """Whether queries for this index can stay on the GPU as torch tensors"""
+        return FAISS_TORCH_AVAILABLE and isinstance(_base_index(index), getattr(faiss, 'GpuIndex', ()))
+    
+    def _encode_text_queries(self, queries: List[str]) -> Union[np.ndarray, "torch.Tensor"]:
+        """Encode queries with the text model into normalized float32 vectors"""
+        if self._query_on_device(self.text_index) and isinstance(self.text_model, SentenceTransformer):
+            return self.text_model.encode(
+                queries, batch_size=64, convert_to_tensor=True, normalize_embeddings=True
+            ).float()
+        
+        return self.text_model.encode(
+            queries, batch_size=64, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+    
+    def _clip_text_encoder(self):
+        """CLIP's encode_text, wrapped in torch.compile on first use when compile_clip is set"""
+        if self._clip_encode_text is None:
+            self._clip_encode_text = self.image_model.encode_text
+            if self.compile_clip and hasattr(torch, 'compile'):
+                # CUDA graphs ('reduce-overhead') only help on GPU, where clip.load already gives fp16 weights
+                mode = 'reduce-overhead' if self.loader.device == 'cuda' else 'default'
+                # dynamic=True: one graph for every query batch size instead of a recompile per size
+                self._clip_encode_text = torch.compile(self.image_model.encode_text, mode=mode, dynamic=True)
+        return self._clip_encode_text
+    
+    def _encode_image_queries(self, queries: List[str]) -> Union[np.ndarray, "torch.Tensor"]:
+        """Encode queries with CLIP's text tower into normalized float32 vectors"""
+        text_tokens = clip.tokenize(queries).to(self.loader.device)
         
-        # Generate query embedding
-        query_embedding = self.text_model.encode([query], convert_to_numpy=True)
+        with torch.no_grad():
+            try:
+                query_embedding = self._clip_text_encoder()(text_tokens).float()
+            except Exception as e:
+                # Compilation happens on the first call; fall back to eager mode if it fails
+                if self._clip_encode_text == self.image_model.encode_text:
+                    raise
+                self.logger.warning(f"torch.compile unavailable for CLIP, using eager encode_text: {e}")
+                self._clip_encode_text = self.image_model.encode_text
+                query_embedding = self._clip_encode_text(text_tokens).float()
+        
+        # A GPU index searches the CUDA tensor directly, skipping the device-to-host copy
+        if self._query_on_device(self.image_index):
+            return F.normalize(query_embedding, dim=-1)
+        
+        query_embedding = query_embedding.cpu().numpy()
         faiss.normalize_L2(query_embedding)
+        return query_embedding
+    
+    def _encode_queries_cached(self, queries: List[str], kind: str, encode) -> Union[np.ndarray, "torch.Tensor"]:
+        """Return normalized query vectors, encoding only queries missing from the LRU cache"""
+        vectors = {}
+        for query in dict.fromkeys(queries):
+            key = (kind, query)
+            if key in self._query_cache:
+                self._query_cache.move_to_end(key)
+                vectors[query] = self._query_cache[key]
+        
+        missing = [query for query in dict.fromkeys(queries) if query not in vectors]
+        if missing:
+            for query, vector in zip(missing, encode(missing)):
+                vectors[query] = self._query_cache[(kind, query)] = vector.clone() if hasattr(vector, 'clone') else vector.copy()
+            while len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        
+        rows = [vectors[query] for query in queries]
+        return torch.stack(rows) if hasattr(rows[0], 'clone') else np.stack(rows)
+    
+    async def search_text(self, query: Union[str, List[str]], top_k: int = 5) -> List[Any]:
+        """Search text and CSV data (batched when given a list of queries)"""
+        single = isinstance(query, str)
+        queries = [query] if single else list(query)
         
-        # Search FAISS index
-        scores, indices = self.text_index.search(query_embedding.astype(np.float32), top_k)
-        
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.text_mapping):
-                item = self.text_mapping[idx]
-                result = {
-                    'id': item['id'],
-                    'dataset': item['dataset'],
-                    'type': item['type'],
-                    'content': item['content'],
-                    'snippet': item['snippet'],
-                    'metadata': item['metadata'],
-                    'file_path': item.get('file_path', ''),
-                    'relevance_score': float(score),
-                    'search_type': 'text'
-                }
-                results.append(result)
+        if not self.text_index or not self.text_model:
+            return [] if single else [[] for _ in queries]
         
-        return results
-    
-    async def search_images(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search image data using text query"""
-        if not self.image_index or not self.image_model:
-            return []
+        # Normalized query embeddings; cache misses are encoded in one encoder pass
+        query_embeddings = self._encode_queries_cached(queries, 'text', self._encode_text_queries)
         
-        # Generate text embedding for image search using CLIP
-        text_tokens = clip.tokenize([query]).to(self.loader.device)
+        # Search FAISS index once for the whole batch
+        scores, positions = self._search_index(self.text_index, self.text_df, query_embeddings, top_k)
         
-        with torch.no_grad():
-            query_embedding = self.image_model.encode_text(text_tokens)
-            query_embedding = query_embedding.cpu().numpy()
+        results = self._build_results(scores, positions, self.text_df, 'text')
+        return results[0] if single else results
+    
+    async def search_images(self, query: Union[str, List[str]], top_k: int = 5) -> List[Any]:
+        """Search image data using text query (batched when given a list of queries)"""
+        single = isinstance(query, str)
+        queries = [query] if single else list(query)
         
-        faiss.normalize_L2(query_embedding)
+        if not self.image_index or not self.image_model:
+            return [] if single else [[] for _ in queries]
         
-        # Search FAISS index
-        scores, indices = self.image_index.search(query_embedding.astype(np.float32), top_k)
+        # Generate text embeddings for image search using CLIP (cached per query)
+        query_embedding = self._encode_queries_cached(queries, 'image', self._encode_image_queries)
         
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.image_mapping):
-                item = self.image_mapping[idx]
-                result = {
-                    'id': item['id'],
-                    'dataset': item['dataset'],
-                    'type': item['type'],
-                    'content': item['content'],
-                    'snippet': item['snippet'],
-                    'metadata': item['metadata'],
-                    'file_path': item.get('file_path', ''),
-                    'relevance_score': float(score),
-                    'search_type': 'image'
-                }
-                results.append(result)
+        # Search FAISS index once for the whole batch
+        scores, positions = self._search_index(self.image_index, self.image_df, query_embedding, top_k)
         
-        return results
+        results = self._build_results(scores, positions, self.image_df, 'image')
+        return results[0] if single else results
     
     async def mongodb_vector_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Alternative search using MongoDB Atlas vector search
-        (Requires MongoDB Atlas with vector search enabled)
+        (Requires MongoDB Atlas with vector search enabled and the
+        embedding_vec field, i.e. an engine created with store_vector_array=True)
         """
-        if not self.collection or not self.text_model:
+        if self.collection is None or not self.text_model:
             return []
         
+        if not self.store_vector_array:
+            raise ValueError("MongoDB vector search needs store_vector_array=True (embedding_vec is not stored)")
+        
         # Generate query embedding
         query_embedding = self.text_model.encode([query], convert_to_numpy=True)[0].tolist()
         
@@ -410,7 +783,7 @@ class MedicalSearchEngine:
                 {
                     "$vectorSearch": {
                         "index": "vector_index",  # You need to create this in MongoDB Atlas
-                        "path": "embedding",
+                        "path": "embedding_vec",
                         "queryVector": query_embedding,
                         "numCandidates": top_k * 10,
                         "limit": top_k
@@ -450,36 +823,44 @@ class MedicalSearchEngine:
             self.logger.error(f"MongoDB vector search error: {e}")
             return []
     
+    def _refresh_stats_codes(self):
+        """Re-encode dataset and type labels of both mappings as uint16 codes"""
+        frame = pd.concat([self.text_df[['dataset', 'type']], self.image_df[['dataset', 'type']]])
+        dataset_codes, dataset_names = pd.factorize(frame['dataset'], use_na_sentinel=False)
+        type_codes, type_names = pd.factorize(frame['type'], use_na_sentinel=False)
+        self._dataset_codes = dataset_codes.astype(np.uint16)
+        self._type_codes = type_codes.astype(np.uint16)
+        self._dataset_names = list(dataset_names)
+        self._type_names = list(type_names)
+    
     def get_dataset_stats(self) -> Dict[str, Any]:
         """Get statistics about loaded datasets"""
         stats = {
-            'total_items': len(self.text_mapping) + len(self.image_mapping),
-            'text_items': len(self.text_mapping),
-            'image_items': len(self.image_mapping),
+            'total_items': len(self.text_df) + len(self.image_df),
+            'text_items': len(self.text_df),
+            'image_items': len(self.image_df),
             'datasets': {}
         }
         
-        # Count by dataset
-        all_items = self.text_mapping + self.image_mapping
-        for item in all_items:
-            dataset = item['dataset']
-            if dataset not in stats['datasets']:
-                stats['datasets'][dataset] = {'total': 0, 'types': {}}
-            
-            stats['datasets'][dataset]['total'] += 1
-            item_type = item['type']
-            if item_type not in stats['datasets'][dataset]['types']:
-                stats['datasets'][dataset]['types'][item_type] = 0
-            stats['datasets'][dataset]['types'][item_type] += 1
+        counts = _tally(self._dataset_codes, self._type_codes,
+                        len(self._dataset_names), len(self._type_names))
+        for d, dataset in enumerate(self._dataset_names):
+            row = counts[d]
+            stats['datasets'][dataset] = {
+                'total': int(row.sum()),
+                'types': {self._type_names[t]: int(row[t]) for t in np.flatnonzero(row)}
+            }
         
         return stats
 
 # Convenience function for external use
 async def create_search_engine(datasets_dir: str = "datasets", 
                                mongo_uri: str = None,
-                               force_rebuild: bool = False) -> MedicalSearchEngine:
+                               force_rebuild: bool = False,
+                               store_vector_array: bool = False) -> MedicalSearchEngine:
     """Create and initialize a medical search engine"""
-    engine = MedicalSearchEngine(datasets_dir=datasets_dir, mongo_uri=mongo_uri)
+    engine = MedicalSearchEngine(datasets_dir=datasets_dir, mongo_uri=mongo_uri,
+                                 store_vector_array=store_vector_array)
     await engine.initialize_search_engine(force_rebuild=force_rebuild)
     return engine
 
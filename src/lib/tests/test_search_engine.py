@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Search engine index tests (CPU only)
+Run with: python -m unittest discover src/lib/tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from searchEngine import _cagra_cpu_index, _index_ids
+
+@unittest.skipUnless(hasattr(faiss, 'IndexHNSWCagra'), "Faiss build without IndexHNSWCagra")
+class CagraCpuIndexTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.random((300, 16), dtype=np.float32)
+        faiss.normalize_L2(self.vectors)
+        self.ids = np.arange(len(self.vectors), dtype=np.int64) * 7 + 1
+        
+        # CPU stand-in for a GPU CAGRA graph
+        self.source = faiss.IndexHNSWCagra(16, 16, faiss.METRIC_INNER_PRODUCT)
+        self.source.add(self.vectors)
+    
+    def copy_to(self, target):
+        """Copy the source graph into target the way GpuIndexCagra.copyTo fills it"""
+        target.d, target.metric_type = self.source.d, self.source.metric_type
+        target.hnsw = self.source.hnsw
+        target.storage = self.source.storage
+        target.own_fields = False
+        target.ntotal, target.is_trained = self.source.ntotal, True
+    
+    def test_wrapping_a_filled_index_is_rejected(self):
+        with self.assertRaises(RuntimeError):
+            faiss.IndexIDMap2(self.source)
+    
+    def test_wrapper_is_filled_after_creation(self):
+        index = _cagra_cpu_index(self.copy_to, self.ids)
+        
+        self.assertEqual(index.ntotal, len(self.vectors))
+        np.testing.assert_array_equal(_index_ids(index), self.ids)
+        _, labels = index.search(self.vectors[:5], 1)
+        np.testing.assert_array_equal(labels[:, 0], self.ids[:5])
+    
+    def test_wrapper_round_trips_through_write_index(self):
+        index = _cagra_cpu_index(self.copy_to, self.ids)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.faiss")
+            faiss.write_index(index, path)
+            loaded = faiss.read_index(path)
+        
+        self.assertIsInstance(faiss.downcast_index(loaded.index), faiss.IndexHNSWCagra)
+        _, labels = loaded.search(self.vectors[:5], 1)
+        np.testing.assert_array_equal(labels[:, 0], self.ids[:5])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Simplified medical trainer tests
+Run with: python -m unittest discover src/lib/tests
+"""
+
+import os
+import sys
+import logging
+import tempfile
+import importlib.util
+import unittest
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+LIB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LIB_DIR)
+
+# The module file names have hyphens, so load them by path
+def _load_by_path(name, file_name):
+    """Import a hyphenated module file from LIB_DIR"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(LIB_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+trainer = _load_by_path("simplified_medical_trainer", "simplified-medical-trainer.py")
+inference = _load_by_path("inference_brain_mri", "inference-brain-mri.py")
+
+class BrainForestTest(unittest.TestCase):
+    def separable_images(self, per_class):
+        """Flattened 64x64 noise images; the tumor class is uniformly brighter"""
+        rng = np.random.default_rng(0)
+        y = np.repeat([0, 1], per_class)
+        X = rng.random((len(y), 64 * 64), dtype=np.float32)
+        X[y == 1] += 0.3
+        return X, y
+    
+    def test_separable_set_trains_above_chance(self):
+        for per_class in (20, 30, 80):
+            X, y = self.separable_images(per_class)
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=0.2, random_state=42, stratify=y
+            )
+            
+            model = trainer._brain_forest(len(X_train)).fit(X_train, y_train)
+            
+            self.assertGreater(model.score(X_test, y_test), 0.8, f"{per_class} images per class")
+            self.assertGreater(np.mean([tree.get_n_leaves() for tree in model.estimators_]), 1)
+    
+    def test_caps_scale_with_training_set_size(self):
+        small, large = trainer._brain_forest(160), trainer._brain_forest(10_000)
+        
+        self.assertEqual(small.min_samples_leaf, 1)
+        self.assertIsNone(small.max_samples)
+        self.assertEqual(large.min_samples_leaf, 20)
+        self.assertEqual(large.max_samples, 0.8)
+
+@unittest.skipUnless(trainer.IMAGE_AVAILABLE and inference.IMAGE_AVAILABLE, "Pillow not installed")
+class BrainFeatureParityTest(unittest.TestCase):
+    def test_inference_features_match_training_rows(self):
+        from PIL import Image
+        
+        rng = np.random.default_rng(0)
+        pixels = rng.integers(0, 256, (300, 220, 3), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for ext in ("jpg", "png"):
+                path = os.path.join(tmp, f"scan.{ext}")
+                Image.fromarray(pixels).save(path)
+                paths.append(path)
+            
+            # Rows the trainer writes for these images
+            X = np.empty((len(paths), 64 * 64), dtype=np.float32)
+            y = np.empty(len(paths), dtype=np.int8)
+            loader = trainer.SimplifiedMedicalTrainer.__new__(trainer.SimplifiedMedicalTrainer)
+            loader.logger = logging.getLogger(__name__)
+            self.assertEqual(loader._load_brain_images(paths, 1, X, y, 0), len(paths))
+            
+            for i, path in enumerate(paths):
+                np.testing.assert_array_equal(inference.extract_brain_features(path), X[i:i + 1])
+                with open(path, 'rb') as f:
+                    np.testing.assert_array_equal(inference.extract_brain_features(f.read()), X[i:i + 1])
+
+if __name__ == "__main__":
+    unittest.main()